@@ -1,7 +1,22 @@
 # this_file: claif_cla/src/claif_cla/__init__.py
 """Claif provider for Anthropic Claude with OpenAI Responses API compatibility."""
 
+from typing import TYPE_CHECKING
+
 from claif_cla.__version__ import __version__
-from claif_cla.client import ClaudeClient
 
-__all__ = ["ClaudeClient", "__version__"]
+if TYPE_CHECKING:
+    from claif_cla.client import AsyncClaudeClient, ClaudeClient
+
+__all__ = ["AsyncClaudeClient", "ClaudeClient", "__version__"]
+
+
+def __getattr__(name: str):
+    # Importing the client pulls in openai and claude-code-sdk, so defer it
+    # until a client class is actually requested
+    if name in ("AsyncClaudeClient", "ClaudeClient"):
+        from claif_cla import client
+
+        return getattr(client, name)
+    msg = f"module {__name__!r} has no attribute {name!r}"
+    raise AttributeError(msg)
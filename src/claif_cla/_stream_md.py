@@ -0,0 +1,98 @@
+# this_file: claif_cla/src/claif_cla/_stream_md.py
+"""Incremental markdown rendering for streamed responses."""
+
+import re
+
+from rich.console import Group
+from rich.markdown import Markdown
+from rich.text import Text
+
+# Opening or closing code fence: up to three spaces, then 3+ backticks or tildes
+_FENCE = re.compile(r" {0,3}(`{3,}|~{3,})")
+# Link reference definition, e.g. "[1]: https://example.com"
+_REFERENCE_DEF = re.compile(r"^ {0,3}\[[^\]]+\]:", re.MULTILINE)
+
+
+def _stable_prefix_length(text: str) -> int:
+    """Return the length of the leading part of ``text`` made of complete blocks.
+
+    A block is complete once it is followed by a blank line that is not inside
+    an open fenced code block, and the next block starts unindented (an
+    indented line may continue a list item). A fence only closes on a fence of
+    the same character that is at least as long as the one that opened it.
+    Incomplete trailing lines are never counted.
+    """
+    fence = ""
+    boundary = 0
+    candidate = 0
+    pos = 0
+    for line in text.splitlines(keepends=True):
+        if candidate and line.strip():
+            if line[0] not in " \t":
+                boundary = candidate
+            candidate = 0
+        if not line.endswith("\n"):
+            break
+        pos += len(line)
+        match = _FENCE.match(line)
+        if fence:
+            if (
+                match
+                and match.group(1)[0] == fence[0]
+                and len(match.group(1)) >= len(fence)
+                and not line[match.end() :].strip()
+            ):
+                fence = ""
+        elif match:
+            fence = match.group(1)
+        elif not line.strip():
+            candidate = pos
+    return boundary
+
+
+class StreamingMarkdown:
+    """Markdown renderer that only re-parses the trailing, still-growing block.
+
+    Completed blocks are parsed once and cached; each ``render()`` only builds
+    a new ``Markdown`` for the unfinished tail, so refresh cost depends on the
+    size of the last block rather than on the whole response.
+    """
+
+    def __init__(self) -> None:
+        self._completed: list[Markdown | Text] = []
+        self._parts: list[str] = []
+        self._tail = ""
+        self._has_references = False
+
+    @property
+    def text(self) -> str:
+        """Full markdown source fed so far."""
+        return "".join(self._parts) + self._tail
+
+    def feed(self, delta: str) -> None:
+        """Append a streamed delta, caching any blocks it completes."""
+        self._tail += delta
+        cut = _stable_prefix_length(self._tail)
+        if not cut:
+            return
+
+        block, self._tail = self._tail[:cut], self._tail[cut:]
+        self._parts.append(block)
+        if _REFERENCE_DEF.search(block):
+            self._has_references = True
+        if block.strip():
+            if self._completed:
+                # Separate blocks the way a single Markdown document would
+                self._completed.append(Text())
+            self._completed.append(Markdown(block))
+
+    def render(self) -> Group:
+        """Build a renderable of the cached blocks plus the current tail."""
+        if self._has_references or _REFERENCE_DEF.search(self._tail):
+            # Reference links resolve across blocks, so parse the whole document
+            return Group(Markdown(self.text))
+        if not self._tail.strip():
+            return Group(*self._completed)
+        if self._completed:
+            return Group(*self._completed, Text(), Markdown(self._tail))
+        return Group(Markdown(self._tail))
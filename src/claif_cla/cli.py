@@ -1,19 +1,169 @@
 # this_file: claif_cla/src/claif_cla/cli.py
 """CLI interface for Claude with OpenAI-compatible API."""
 
+import contextlib
+import re
 import sys
+import threading
+from collections.abc import Iterable, Iterator
+from functools import cached_property, lru_cache
+from typing import TYPE_CHECKING
 
-import fire
 from rich.console import Console
-from rich.live import Live
-from rich.markdown import Markdown
-from rich.panel import Panel
-from rich.spinner import Spinner
+from rich.text import Text
 
-from claif_cla.client import ClaudeClient
+if TYPE_CHECKING:
+    from openai.types.chat import ChatCompletionChunk
+
+    from claif_cla.client import ClaudeClient
 
 console = Console()
 
+# Styled labels parsed from markup once instead of on every print
+_TITLE_CLAUDE = Text.from_markup("[bold blue]Claude Response[/bold blue]")
+_CHAT_HEADER = Text.from_markup("[bold green]Claude Interactive Chat[/bold green]")
+_CLAUDE_LABEL = Text.from_markup("\n[bold magenta]Claude:[/bold magenta] ")
+_QUERYING = Text.from_markup("[bold green]Querying Claude...")
+
+# Words that end an interactive chat session
+_EXIT_COMMANDS = frozenset({"exit", "quit"})
+
+# Known Claude models shown by the `models` command
+_MODELS = (
+    {"id": "claude-3-5-sonnet-20241022", "name": "Claude 3.5 Sonnet", "context": "200K"},
+    {"id": "claude-3-5-haiku-20241022", "name": "Claude 3.5 Haiku", "context": "200K"},
+    {"id": "claude-3-opus-20240229", "name": "Claude 3 Opus", "context": "200K"},
+    {"id": "claude-3-sonnet-20240229", "name": "Claude 3 Sonnet", "context": "200K"},
+    {"id": "claude-3-haiku-20240307", "name": "Claude 3 Haiku", "context": "200K"},
+    {"id": "claude-2.1", "name": "Claude 2.1", "context": "200K"},
+    {"id": "claude-2.0", "name": "Claude 2.0", "context": "100K"},
+    {"id": "claude-instant-1.2", "name": "Claude Instant 1.2", "context": "100K"},
+)
+
+# Characters and lines that suggest a response needs markdown rendering: inline
+# markup, list items ("-", "+", "1.", "1)"), setext heading underlines ("===",
+# "---") and indented code blocks
+_MARKDOWN_HINT = re.compile(
+    r"[`*_#\[\]>|~]"
+    r"|^[ \t]*(?:[-+]|\d+[.)])\s"
+    r"|^[ \t]*(?:=+|-+)[ \t]*$"
+    r"|^(?: {4}|\t)[ \t]*\S",
+    re.MULTILINE,
+)
+
+# Seconds between re-renders of the streamed markdown panel
+_RENDER_INTERVAL = 0.1
+# Maximum seconds a streamed chat token waits before it is written
+_FLUSH_INTERVAL = 0.032
+# Write streamed chat tokens early once this many are pending
+_FLUSH_TOKENS = 50
+
+
+def _response_title(model: str) -> Text:
+    """Build the response panel title for ``model``."""
+    return Text.assemble(_TITLE_CLAUDE, f" (Model: {model})")
+
+
+def _iter_text(stream: Iterable["ChatCompletionChunk"]) -> Iterator[str]:
+    """Yield the non-empty text deltas of a chat completion stream."""
+    for chunk in stream:
+        # Each attribute access on a chunk goes through pydantic, so walk once
+        choices = chunk.choices
+        if not choices:
+            continue
+        text = choices[0].delta.content
+        if text:
+            yield text
+
+
+def _input_prompt() -> str:
+    """Return the chat input prompt, enabling readline line editing when available."""
+    try:
+        import readline  # gives input() line editing and history
+    except ImportError:
+        readline = None
+    # Respect NO_COLOR and the console's colour detection like console.input did
+    if console.no_color or console.color_system is None:
+        return "\nYou: "
+    if readline is None:
+        return "\n\x1b[1;36mYou:\x1b[0m "
+    # \x01/\x02 tell readline that the escape codes take no space on screen
+    return "\n\x01\x1b[1;36m\x02You:\x01\x1b[0m\x02 "
+
+
+class _TokenWriter:
+    """Write streamed tokens to a file in batches without holding any back.
+
+    Pending tokens are written once ``max_pending`` of them are buffered, and
+    a background thread writes whatever is pending ``interval`` seconds after
+    it arrived, so text never waits for the next token when the stream pauses.
+    """
+
+    def __init__(self, file, interval: float = _FLUSH_INTERVAL, max_pending: int = _FLUSH_TOKENS):
+        self._file = file
+        self._interval = interval
+        self._max_pending = max_pending
+        self._pending: list[str] = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def write(self, text: str) -> None:
+        """Queue ``text``, writing the batch now if it is full."""
+        with self._lock:
+            self._pending.append(text)
+            if len(self._pending) >= self._max_pending:
+                self._flush()
+            else:
+                self._wake.set()
+
+    def close(self, tail: str = "") -> None:
+        """Write anything still pending followed by ``tail``, then stop."""
+        with self._lock:
+            if self._closed.is_set():
+                return
+            self._closed.set()
+            if tail:
+                self._pending.append(tail)
+            self._flush()
+        self._wake.set()
+        self._thread.join()
+
+    def _flush(self) -> None:
+        # Callers hold self._lock
+        if self._pending:
+            self._file.write("".join(self._pending))
+            self._file.flush()
+            self._pending.clear()
+
+    def _run(self) -> None:
+        while True:
+            self._wake.wait()
+            # Let a burst accumulate, but stop at once when closed
+            if self._closed.wait(self._interval):
+                return
+            with self._lock:
+                self._wake.clear()
+                self._flush()
+
+
+@lru_cache(maxsize=1)
+def _build_models_table():
+    """Build the Rich table listing the known models (built once per process)."""
+    from rich.table import Table
+
+    table = Table(title="Available Claude Models")
+    table.add_column("Model ID", style="cyan")
+    table.add_column("Name", style="green")
+    table.add_column("Context Window", style="yellow")
+
+    for model in _MODELS:
+        table.add_row(model["id"], model["name"], model["context"])
+
+    return table
+
 
 class CLI:
     """Command-line interface for Claude."""
@@ -24,7 +174,14 @@ class CLI:
         Args:
             api_key: Anthropic API key (defaults to ANTHROPIC_API_KEY env var)
         """
-        self._client = ClaudeClient(api_key=api_key)
+        self._api_key = api_key
+
+    @cached_property
+    def _client(self) -> "ClaudeClient":
+        # Deferred so that `models` and `version` never import openai or the SDK
+        from claif_cla.client import ClaudeClient
+
+        return ClaudeClient(api_key=self._api_key)
 
     def query(
         self,
@@ -35,6 +192,7 @@ class CLI:
         stream: bool = False,
         system: str | None = None,
         json_output: bool = False,
+        plain: bool = False,
     ):
         """Query Claude with a prompt.
 
@@ -46,6 +204,8 @@ class CLI:
             stream: Whether to stream the response
             system: Optional system message
             json_output: Output raw JSON instead of formatted text
+            plain: Print raw text without markdown rendering (default when
+                stdout is not a terminal)
         """
         # Build messages
         messages = []
@@ -62,62 +222,120 @@ class CLI:
         if max_tokens:
             params["max_tokens"] = max_tokens
 
+        plain = plain or not console.is_terminal
+
         try:
             if stream:
-                self._stream_response(params, json_output)
+                self._stream_response(params, json_output, plain)
             else:
-                self._sync_response(params, json_output)
+                self._sync_response(params, json_output, plain)
         except Exception as e:
             console.print(f"[red]Error: {e}[/red]")
             sys.exit(1)
 
-    def _sync_response(self, params: dict, json_output: bool):
+    def _sync_response(self, params: dict, json_output: bool, plain: bool = False):
         """Handle synchronous response."""
-        with console.status("[bold green]Querying Claude...", spinner="dots"):
+        # The spinner runs a refresh thread, so only start it when someone can see it
+        if console.is_terminal and not plain:
+            status = console.status(_QUERYING, spinner="dots")
+        else:
+            status = contextlib.nullcontext()
+        with status:
             response = self._client.chat.completions.create(**params)
 
         if json_output:
-            console.print_json(response.model_dump_json(indent=2))
+            # print_json re-parses and indents, so hand it compact JSON
+            console.print_json(response.model_dump_json())
+        elif plain:
+            # Skip markdown parsing entirely when nobody will see the styling
+            sys.stdout.write(response.choices[0].message.content or "")
+            sys.stdout.write("\n")
         else:
-            content = response.choices[0].message.content
+            from rich.panel import Panel
+
+            content = response.choices[0].message.content or ""
+            if _MARKDOWN_HINT.search(content):
+                from rich.markdown import Markdown
+
+                body = Markdown(content)
+            else:
+                # No markdown syntax, so skip the markdown parser
+                body = Text(content)
             console.print(
                 Panel(
-                    Markdown(content),
-                    title=f"[bold blue]Claude Response[/bold blue] (Model: {response.model})",
+                    body,
+                    title=_response_title(response.model),
                     border_style="blue",
                 )
             )
 
-    def _stream_response(self, params: dict, json_output: bool):
+    def _stream_response(self, params: dict, json_output: bool, plain: bool = False):
         """Handle streaming response."""
         params["stream"] = True
 
         if json_output:
-            # Stream JSON chunks
-            for chunk in self._client.chat.completions.create(**params):
-                console.print_json(chunk.model_dump_json())
+            # Stream JSON chunks as NDJSON, batching writes instead of
+            # highlighting every chunk through Rich
+            writer = _TokenWriter(sys.stdout, max_pending=64)
+            try:
+                for chunk in self._client.chat.completions.create(**params):
+                    writer.write(chunk.model_dump_json() + "\n")
+            finally:
+                writer.close()
+        elif plain:
+            # Stream raw text
+            for text in _iter_text(self._client.chat.completions.create(**params)):
+                sys.stdout.write(text)
+                sys.stdout.flush()
+            sys.stdout.write("\n")
         else:
+            from rich.live import Live
+            from rich.panel import Panel
+            from rich.spinner import Spinner
+
+            from claif_cla._stream_md import StreamingMarkdown
+
             # Stream formatted text
-            content = ""
+            # Only the trailing markdown block is re-parsed per render. Live's
+            # refresh thread redraws every _RENDER_INTERVAL seconds, so text that
+            # arrives just before a pause in the stream is still shown.
+            md = StreamingMarkdown()
+            lock = threading.Lock()
+            panel = Panel(
+                Spinner("dots", text="Waiting for response..."),
+                title=_response_title(params["model"]),
+                border_style="blue",
+            )
+            fed = rendered = 0
+
+            def frame() -> Panel:
+                nonlocal rendered
+                with lock:
+                    if fed > rendered:
+                        # Swap the panel body in place rather than rebuilding the panel
+                        panel.renderable = md.render()
+                        rendered = fed
+                return panel
+
             with Live(
-                Panel(
-                    Spinner("dots", text="Waiting for response..."),
-                    title="[bold blue]Claude Response[/bold blue]",
-                    border_style="blue",
-                ),
-                refresh_per_second=10,
+                get_renderable=frame,
+                refresh_per_second=1 / _RENDER_INTERVAL,
                 console=console,
             ) as live:
-                for chunk in self._client.chat.completions.create(**params):
-                    if chunk.choices and chunk.choices[0].delta.content:
-                        content += chunk.choices[0].delta.content
-                        live.update(
-                            Panel(
-                                Markdown(content),
-                                title=f"[bold blue]Claude Response[/bold blue] (Model: {params['model']})",
-                                border_style="blue",
-                            )
-                        )
+                for text in _iter_text(self._client.chat.completions.create(**params)):
+                    with lock:
+                        md.feed(text)
+                        fed += 1
+
+                # Block-wise parsing can differ from a full parse (e.g. reference
+                # links), so leave a single full render of the response on screen
+                if md.text:
+                    from rich.markdown import Markdown
+
+                    with lock:
+                        panel.renderable = Markdown(md.text)
+                        rendered = fed
+                    live.refresh()
 
     def models(self, json_output: bool = False):
         """List available Claude models.
@@ -125,31 +343,10 @@ class CLI:
         Args:
             json_output: Output as JSON instead of formatted table
         """
-        models = [
-            {"id": "claude-3-5-sonnet-20241022", "name": "Claude 3.5 Sonnet", "context": "200K"},
-            {"id": "claude-3-5-haiku-20241022", "name": "Claude 3.5 Haiku", "context": "200K"},
-            {"id": "claude-3-opus-20240229", "name": "Claude 3 Opus", "context": "200K"},
-            {"id": "claude-3-sonnet-20240229", "name": "Claude 3 Sonnet", "context": "200K"},
-            {"id": "claude-3-haiku-20240307", "name": "Claude 3 Haiku", "context": "200K"},
-            {"id": "claude-2.1", "name": "Claude 2.1", "context": "200K"},
-            {"id": "claude-2.0", "name": "Claude 2.0", "context": "100K"},
-            {"id": "claude-instant-1.2", "name": "Claude Instant 1.2", "context": "100K"},
-        ]
-
         if json_output:
-            console.print_json(data=models)
+            console.print_json(data=list(_MODELS))
         else:
-            from rich.table import Table
-
-            table = Table(title="Available Claude Models")
-            table.add_column("Model ID", style="cyan")
-            table.add_column("Name", style="green")
-            table.add_column("Context Window", style="yellow")
-
-            for model in models:
-                table.add_row(model["id"], model["name"], model["context"])
-
-            console.print(table)
+            console.print(_build_models_table())
 
     def chat(
         self,
@@ -164,11 +361,15 @@ class CLI:
             temperature: Sampling temperature (0-2)
             system: Optional system message
         """
+        from rich.panel import Panel
+
         console.print(
             Panel(
-                "[bold green]Claude Interactive Chat[/bold green]\n"
-                f"Model: {model} | Temperature: {temperature}\n"
-                "Type 'exit' or 'quit' to end the session.",
+                Text.assemble(
+                    _CHAT_HEADER,
+                    f"\nModel: {model} | Temperature: {temperature}\n",
+                    "Type 'exit' or 'quit' to end the session.",
+                ),
                 border_style="green",
             )
         )
@@ -177,43 +378,58 @@ class CLI:
         if system:
             messages.append({"role": "system", "content": system})
 
+        interactive = console.is_terminal and sys.stdin.isatty()
+        prompt = _input_prompt() if interactive else ""
+
         while True:
             # Get user input
             try:
-                user_input = console.input("\n[bold cyan]You:[/bold cyan] ")
+                if interactive:
+                    user_input = input(prompt)
+                else:
+                    line = sys.stdin.readline()
+                    if not line:
+                        break
+                    user_input = line.rstrip("\r\n")
             except (EOFError, KeyboardInterrupt):
                 break
 
-            if user_input.lower() in ["exit", "quit"]:
+            if user_input.strip().lower() in _EXIT_COMMANDS:
                 break
 
             # Add user message
             messages.append({"role": "user", "content": user_input})
 
             # Get assistant response
-            console.print("\n[bold magenta]Claude:[/bold magenta] ", end="")
+            console.print(_CLAUDE_LABEL, end="")
 
+            writer = _TokenWriter(console.file)
             try:
-                content = ""
-                for chunk in self._client.chat.completions.create(
+                parts = []
+                stream = self._client.chat.completions.create(
                     model=model,
                     messages=messages,
                     temperature=temperature,
                     stream=True,
-                ):
-                    if chunk.choices and chunk.choices[0].delta.content:
-                        chunk_content = chunk.choices[0].delta.content
-                        content += chunk_content
-                        console.print(chunk_content, end="")
+                )
+                for text in _iter_text(stream):
+                    parts.append(text)
+                    writer.write(text)
+
+                # Write the tail and the newline after the response in one call
+                writer.close("\n")
 
                 # Add assistant message to history
-                messages.append({"role": "assistant", "content": content})
-                console.print()  # New line after response
+                messages.append({"role": "assistant", "content": "".join(parts)})
 
             except Exception as e:
+                # Show the text that arrived before the failure
+                writer.close()
                 console.print(f"\n[red]Error: {e}[/red]")
                 # Remove the user message if we failed to get a response
                 messages.pop()
+            finally:
+                writer.close()
 
         console.print("\n[green]Chat session ended.[/green]")
 
@@ -226,4 +442,6 @@ class CLI:
 
 def main():
     """Main entry point for the CLI."""
+    import fire
+
     fire.Fire(CLI)
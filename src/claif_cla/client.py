@@ -1,9 +1,12 @@
 # this_file: claif_cla/src/claif_cla/client.py
 """Claude client with OpenAI Responses API compatibility using claude-code-sdk."""
 
+import asyncio
+import json
 import os
 import time
-from collections.abc import Iterator
+from collections.abc import AsyncIterator, Iterator
+from functools import cached_property
 from typing import Any
 
 from openai import NOT_GIVEN, NotGiven
@@ -28,6 +31,108 @@ except ImportError:
     ClaudeCodeClient = None
     ClaudeMessage = None
 
+# Prompts shorter than this (roughly 1024 tokens) are below Anthropic's minimum
+# cacheable prefix, so marking them for caching only adds overhead
+_CACHE_MIN_CHARS = 4096
+
+
+def _cache_block(text: str) -> dict[str, Any]:
+    """Build a text content block marked for Anthropic prompt caching."""
+    return {"type": "text", "text": text, "cache_control": {"type": "ephemeral"}}
+
+
+# The process id only changes across fork(), so read it once and refresh it in children
+_PID = os.getpid()
+
+
+def _refresh_pid() -> None:
+    global _PID
+    _PID = os.getpid()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_refresh_pid)
+
+
+def _completion_id(timestamp: int) -> str:
+    """Build an OpenAI-style completion id for a request created at ``timestamp``."""
+    return f"chatcmpl-{timestamp}{_PID}"
+
+
+# Anthropic stop reasons that map to a different OpenAI finish_reason
+_FINISH_REASONS = {"max_tokens": "length", "tool_use": "tool_calls"}
+
+
+def _chunk(
+    chunk_id: str, created: int, model: str, delta: ChoiceDelta, finish_reason: str | None = None
+) -> ChatCompletionChunk:
+    """Build a single-choice streaming chunk."""
+    return ChatCompletionChunk(
+        id=chunk_id,
+        object="chat.completion.chunk",
+        created=created,
+        model=model,
+        choices=[ChunkChoice(index=0, delta=delta, finish_reason=finish_reason, logprobs=None)],
+    )
+
+
+def _response_text(response: Any) -> str:
+    """Extract the text of an SDK response, checking the common shapes first."""
+    if isinstance(response, str):
+        return response
+    try:
+        content = response.content
+    except AttributeError:
+        return str(response)
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return "".join(block.text for block in content if hasattr(block, "text"))
+    return str(content)
+
+
+def _extract_prompt(messages: list[ChatCompletionMessageParam]) -> tuple[str, str]:
+    """Return the ``(prompt, system_prompt)`` pair for an OpenAI messages list.
+
+    The prompt is the last user message followed by any assistant replies
+    after it; the system prompt is the last system message.
+    """
+    prompt = ""
+    system_prompt = ""
+    have_prompt = have_system = False
+    # Assistant replies after the last user message, newest first
+    replies = []
+
+    # Scan from the end so both can stop as soon as their message is found
+    for msg in reversed(messages):
+        if isinstance(msg, dict):
+            role = msg["role"]
+            content = msg["content"]
+        else:
+            role = msg.role
+            content = msg.content
+
+        if role == "system":
+            if not have_system:
+                system_prompt = content
+                have_system = True
+        elif have_prompt:
+            pass
+        elif role == "user":
+            prompt = content
+            have_prompt = True
+        elif role == "assistant":
+            replies.append(content)
+
+        if have_prompt and have_system:
+            break
+
+    if prompt and replies:
+        # For multi-turn conversations, append assistant responses in one join
+        prompt = "".join([f"{prompt}", *(f"\n\nAssistant: {c}\n\nHuman: " for c in reversed(replies))])
+
+    return prompt, system_prompt
+
 
 class ChatCompletions:
     """Namespace for completions methods to match OpenAI client structure."""
@@ -35,6 +140,15 @@ class ChatCompletions:
     def __init__(self, parent: "ClaudeClient"):
         self.parent = parent
 
+    # The SDK client's shape is fixed for its lifetime, so probe it only once
+    @cached_property
+    def _uses_query(self) -> bool:
+        return hasattr(self.parent._client, "query")
+
+    @cached_property
+    def _uses_messages_stream(self) -> bool:
+        return not self._uses_query and hasattr(self.parent._client.messages, "stream")
+
     def create(
         self,
         *,
@@ -63,35 +177,20 @@ class ChatCompletions:
         extra_query: Any | None | NotGiven = NOT_GIVEN,
         extra_body: Any | None | NotGiven = NOT_GIVEN,
         timeout: float | NotGiven = NOT_GIVEN,
+        cache_system: bool = True,
     ) -> ChatCompletion | Iterator[ChatCompletionChunk]:
         """Create a chat completion using Claude Code SDK.
 
         This method provides compatibility with OpenAI's chat.completions.create API.
+        When the Messages API is used, the system prompt (and a long user prompt)
+        is sent with Anthropic ``cache_control`` markers unless ``cache_system``
+        is False, so repeated prefixes are served from the prompt cache.
         """
         if not HAS_CLAUDE_CODE_SDK:
             msg = "claude-code-sdk is not installed. Please install it with: pip install claude-code-sdk"
             raise ImportError(msg)
 
-        # Extract the last user message as the prompt
-        prompt = ""
-        system_prompt = ""
-
-        for msg in messages:
-            if isinstance(msg, dict):
-                role = msg["role"]
-                content = msg["content"]
-            else:
-                role = msg.role
-                content = msg.content
-
-            if role == "system":
-                system_prompt = content
-            elif role == "user":
-                prompt = content  # Take the last user message
-            elif role == "assistant":
-                # For multi-turn conversations, append assistant responses
-                if prompt:
-                    prompt = f"{prompt}\n\nAssistant: {content}\n\nHuman: "
+        prompt, system_prompt = _extract_prompt(messages)
 
         # Map parameters to claude-code-sdk options
         options = {}
@@ -104,32 +203,37 @@ class ChatCompletions:
 
         # Handle streaming
         if stream is True:
-            return self._create_stream(prompt, model, options)
-        return self._create_sync(prompt, model, options)
-
-    def _create_sync(self, prompt: str, model: str, options: dict) -> ChatCompletion:
+            return self._create_stream(prompt, model, options, cache_system)
+        return self._create_sync(prompt, model, options, cache_system)
+
+    def _messages_kwargs(self, prompt: str, model: str, options: dict, cache_system: bool) -> dict[str, Any]:
+        """Build keyword arguments for the Messages API."""
+        content: Any = prompt
+        kwargs = dict(options)
+        if cache_system:
+            if kwargs.get("system"):
+                kwargs["system"] = [_cache_block(kwargs["system"])]
+            if len(prompt) >= _CACHE_MIN_CHARS:
+                content = [_cache_block(prompt)]
+        return {"model": model, "messages": [{"role": "user", "content": content}], **kwargs}
+
+    def _create_sync(self, prompt: str, model: str, options: dict, cache_system: bool = True) -> ChatCompletion:
         """Create a synchronous chat completion."""
         # Call claude-code-sdk
-        if hasattr(self.parent._client, "query"):
+        if self._uses_query:
             # Use query method if available
             response = self.parent._client.query(prompt, **options)
         else:
             # Fall back to messages API
             response = self.parent._client.messages.create(
-                model=model, messages=[{"role": "user", "content": prompt}], **options
+                **self._messages_kwargs(prompt, model, options, cache_system)
             )
 
         # Convert response to ChatCompletion format
         timestamp = int(time.time())
 
         # Extract content from response
-        if hasattr(response, "content"):
-            if isinstance(response.content, list):
-                content = "".join(block.text for block in response.content if hasattr(block, "text"))
-            else:
-                content = str(response.content)
-        else:
-            content = str(response)
+        content = _response_text(response)
 
         # Calculate token usage
         prompt_tokens = 0
@@ -138,11 +242,8 @@ class ChatCompletions:
             prompt_tokens = getattr(response.usage, "input_tokens", 0)
             completion_tokens = getattr(response.usage, "output_tokens", 0)
 
-        # Create unique ID
-        response_id = f"chatcmpl-{timestamp}{os.getpid()}"
-
         return ChatCompletion(
-            id=response_id,
+            id=_completion_id(timestamp),
             object="chat.completion",
             created=timestamp,
             model=model,
@@ -164,62 +265,48 @@ class ChatCompletions:
             ),
         )
 
-    def _create_stream(self, prompt: str, model: str, options: dict) -> Iterator[ChatCompletionChunk]:
+    def _create_stream(
+        self, prompt: str, model: str, options: dict, cache_system: bool = True
+    ) -> Iterator[ChatCompletionChunk]:
         """Create a streaming chat completion."""
-        # For now, implement a simple non-streaming fallback
-        # In a real implementation, this would use claude-code-sdk's streaming API
-        response = self._create_sync(prompt, model, options)
+        if self._uses_messages_stream:
+            yield from self._create_sdk_stream(prompt, model, options, cache_system)
+            return
 
-        timestamp = int(time.time())
-        chunk_id = f"chatcmpl-{timestamp}{os.getpid()}"
+        # The query API has no streaming variant, so emit the whole answer as one chunk
+        response = self._create_sync(prompt, model, options, cache_system)
+        # Reuse the response's id and timestamp for every chunk
+        chunk_id = response.id
+        timestamp = response.created
 
         # Initial chunk with role
-        yield ChatCompletionChunk(
-            id=chunk_id,
-            object="chat.completion.chunk",
-            created=timestamp,
-            model=model,
-            choices=[
-                ChunkChoice(
-                    index=0,
-                    delta=ChoiceDelta(role="assistant", content=""),
-                    finish_reason=None,
-                    logprobs=None,
-                )
-            ],
-        )
-
+        yield _chunk(chunk_id, timestamp, model, ChoiceDelta(role="assistant", content=""))
         # Content chunk
-        yield ChatCompletionChunk(
-            id=chunk_id,
-            object="chat.completion.chunk",
-            created=timestamp,
-            model=model,
-            choices=[
-                ChunkChoice(
-                    index=0,
-                    delta=ChoiceDelta(content=response.choices[0].message.content),
-                    finish_reason=None,
-                    logprobs=None,
-                )
-            ],
-        )
-
+        yield _chunk(chunk_id, timestamp, model, ChoiceDelta(content=response.choices[0].message.content))
         # Final chunk
-        yield ChatCompletionChunk(
-            id=chunk_id,
-            object="chat.completion.chunk",
-            created=timestamp,
-            model=model,
-            choices=[
-                ChunkChoice(
-                    index=0,
-                    delta=ChoiceDelta(),
-                    finish_reason="stop",
-                    logprobs=None,
-                )
-            ],
-        )
+        yield _chunk(chunk_id, timestamp, model, ChoiceDelta(), "stop")
+
+    def _create_sdk_stream(
+        self, prompt: str, model: str, options: dict, cache_system: bool
+    ) -> Iterator[ChatCompletionChunk]:
+        """Yield a chunk per text delta from the SDK's Messages streaming API."""
+        timestamp = int(time.time())
+        chunk_id = _completion_id(timestamp)
+        finish_reason = "stop"
+
+        kwargs = self._messages_kwargs(prompt, model, options, cache_system)
+        with self.parent._client.messages.stream(**kwargs) as events:
+            yield _chunk(chunk_id, timestamp, model, ChoiceDelta(role="assistant", content=""))
+            for event in events:
+                if event.type == "content_block_delta":
+                    text = getattr(event.delta, "text", None)
+                    if text:
+                        yield _chunk(chunk_id, timestamp, model, ChoiceDelta(content=text))
+                elif event.type == "message_delta":
+                    stop_reason = getattr(event.delta, "stop_reason", None)
+                    finish_reason = _FINISH_REASONS.get(stop_reason, "stop")
+
+        yield _chunk(chunk_id, timestamp, model, ChoiceDelta(), finish_reason)
 
 
 class Chat:
@@ -275,3 +362,117 @@ class ClaudeClient:
     def create(self, **kwargs) -> ChatCompletion:
         """Create a chat completion (backward compatibility method)."""
         return self.chat.completions.create(**kwargs)
+
+
+async def _iterate_in_thread(iterator: Iterator[ChatCompletionChunk]) -> AsyncIterator[ChatCompletionChunk]:
+    """Drive a blocking chunk iterator from a worker thread, one chunk at a time."""
+    done = object()
+    while True:
+        chunk = await asyncio.to_thread(next, iterator, done)
+        if chunk is done:
+            return
+        yield chunk
+
+
+def _request_key(params: dict[str, Any]) -> str | None:
+    """Return a key identifying ``params``, or None if they cannot be keyed."""
+    try:
+        return json.dumps(params, sort_keys=True)
+    except (TypeError, ValueError):
+        return None
+
+
+class _RequestCoalescer:
+    """Share one upstream call between identical concurrent requests."""
+
+    def __init__(self) -> None:
+        self._inflight: dict[str, asyncio.Future] = {}
+
+    async def run(self, key: str, call) -> ChatCompletion:
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(call())
+            self._inflight[key] = future
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # Shield so one caller giving up does not cancel the call for the others
+        response = await asyncio.shield(future)
+        # Give each caller its own object so mutations do not leak between them
+        return response.model_copy(deep=True)
+
+
+class AsyncChatCompletions:
+    """Async namespace for completions methods to match OpenAI's AsyncOpenAI structure."""
+
+    def __init__(self, parent: "AsyncClaudeClient"):
+        self.parent = parent
+        self._coalescer = _RequestCoalescer() if parent.batch else None
+
+    async def create(
+        self,
+        *,
+        messages: list[ChatCompletionMessageParam],
+        model: str = "claude-3-5-sonnet-20241022",
+        stream: bool | None | NotGiven = NOT_GIVEN,
+        **kwargs: Any,
+    ) -> ChatCompletion | AsyncIterator[ChatCompletionChunk]:
+        """Create a chat completion without blocking the event loop.
+
+        Accepts the same parameters as ``ChatCompletions.create``. The SDK calls
+        are blocking, so they run in worker threads; with ``stream=True`` the
+        awaited result is an async iterator that yields chunks as they arrive.
+        """
+        completions = self.parent._sync_client.chat.completions
+        if stream is True:
+            iterator = completions.create(messages=messages, model=model, stream=True, **kwargs)
+            return _iterate_in_thread(iterator)
+
+        def call():
+            return asyncio.to_thread(completions.create, messages=messages, model=model, **kwargs)
+
+        if self._coalescer is not None:
+            key = _request_key({"messages": messages, "model": model, **kwargs})
+            if key is not None:
+                return await self._coalescer.run(key, call)
+        return await call()
+
+
+class AsyncChat:
+    """Async namespace for chat-related methods to match OpenAI client structure."""
+
+    def __init__(self, parent: "AsyncClaudeClient"):
+        self.parent = parent
+        self.completions = AsyncChatCompletions(parent)
+
+
+class AsyncClaudeClient:
+    """Async Claude client compatible with OpenAI's AsyncOpenAI chat completions API."""
+
+    def __init__(
+        self,
+        api_key: str | None = None,
+        base_url: str | None = None,
+        timeout: float = 600.0,
+        batch: bool = False,
+    ):
+        """Initialize the async Claude client.
+
+        Args:
+            api_key: Anthropic API key (defaults to env var)
+            base_url: Base URL for Claude Code SDK (optional)
+            timeout: Request timeout in seconds
+            batch: Coalesce identical concurrent non-streaming requests into
+                a single upstream call whose result is shared by all callers
+        """
+        self._sync_client = ClaudeClient(api_key=api_key, base_url=base_url, timeout=timeout)
+        self.api_key = self._sync_client.api_key
+        self.base_url = base_url
+        self.timeout = timeout
+        self.batch = batch
+
+        # Create namespace structure to match OpenAI client
+        self.chat = AsyncChat(self)
+
+    # Convenience method for backward compatibility
+    async def create(self, **kwargs) -> ChatCompletion | AsyncIterator[ChatCompletionChunk]:
+        """Create a chat completion (backward compatibility method)."""
+        return await self.chat.completions.create(**kwargs)
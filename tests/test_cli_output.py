@@ -0,0 +1,280 @@
+# this_file: claif_cla/tests/test_cli_output.py
+"""Tests for what the CLI sends and prints."""
+
+import io
+import json
+import time
+from unittest.mock import MagicMock
+
+import pytest
+from openai.types.chat import ChatCompletion, ChatCompletionChunk
+from openai.types.chat.chat_completion_chunk import Choice as ChunkChoice
+from openai.types.chat.chat_completion_chunk import ChoiceDelta
+from rich.console import Console
+
+from claif_cla.cli import _MARKDOWN_HINT, CLI, _input_prompt
+
+
+def _chunks(*texts: str) -> list[ChatCompletionChunk]:
+    """Build a stream of chunks carrying ``texts`` as content deltas."""
+    return [
+        ChatCompletionChunk(
+            id="chatcmpl-test",
+            object="chat.completion.chunk",
+            created=0,
+            model="claude-3-5-sonnet-20241022",
+            choices=[ChunkChoice(index=0, delta=ChoiceDelta(content=text), finish_reason=None)],
+        )
+        for text in texts
+    ]
+
+
+def _wait_for(buf: io.StringIO, text: str, timeout: float = 2.0) -> bool:
+    """Wait until ``text`` was written to ``buf``."""
+    deadline = time.monotonic() + timeout
+    while text not in buf.getvalue():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.005)
+    return True
+
+
+@pytest.fixture
+def cli():
+    """Create a CLI whose client is a mock."""
+    cli = CLI()
+    cli._client = MagicMock()
+    return cli
+
+
+@pytest.mark.unit
+class TestChat:
+    """Test the messages sent by the interactive chat."""
+
+    def test_messages_sent_per_turn(self, cli, monkeypatch, capsys):
+        """Test that each turn sends the system message and the full history."""
+        sent = []
+
+        def create(**kwargs):
+            sent.append([dict(m) for m in kwargs["messages"]])
+            return iter(_chunks(f"a{len(sent)}"))
+
+        cli._client.chat.completions.create.side_effect = create
+        monkeypatch.setattr("sys.stdin", io.StringIO("u1\nu2\nexit\n"))
+
+        cli.chat(system="S")
+
+        assert sent == [
+            [{"role": "system", "content": "S"}, {"role": "user", "content": "u1"}],
+            [
+                {"role": "system", "content": "S"},
+                {"role": "user", "content": "u1"},
+                {"role": "assistant", "content": "a1"},
+                {"role": "user", "content": "u2"},
+            ],
+        ]
+        out = capsys.readouterr().out
+        assert "a1\n" in out
+        assert "a2\n" in out
+
+    def test_piped_crlf_input(self, cli, monkeypatch, capsys):
+        """Test that CRLF line endings are not sent to the model."""
+        cli._client.chat.completions.create.return_value = iter(_chunks("ok"))
+        monkeypatch.setattr("sys.stdin", io.StringIO("u1\r\n"))
+
+        cli.chat()
+
+        messages = cli._client.chat.completions.create.call_args.kwargs["messages"]
+        assert messages[0] == {"role": "user", "content": "u1"}
+
+    def test_failed_turn_is_dropped(self, cli, monkeypatch, capsys):
+        """Test that a user message whose response failed is not sent again."""
+        sent = []
+
+        def create(**kwargs):
+            sent.append([dict(m) for m in kwargs["messages"]])
+            if len(sent) == 1:
+                raise RuntimeError("boom")
+            return iter(_chunks("ok"))
+
+        cli._client.chat.completions.create.side_effect = create
+        monkeypatch.setattr("sys.stdin", io.StringIO("u1\nu2\n"))
+
+        cli.chat()
+
+        assert sent[1] == [{"role": "user", "content": "u2"}]
+        assert "Error: boom" in capsys.readouterr().out
+
+    def test_text_is_shown_while_stream_pauses(self, cli, monkeypatch):
+        """Test that buffered text is written without waiting for the next token."""
+        buf = io.StringIO()
+        monkeypatch.setattr("claif_cla.cli.console", Console(file=buf, width=80))
+        shown = []
+
+        def stream():
+            yield from _chunks("partial")
+            shown.append(_wait_for(buf, "partial"))
+            yield from _chunks(" rest")
+
+        cli._client.chat.completions.create.return_value = stream()
+        monkeypatch.setattr("sys.stdin", io.StringIO("u1\n"))
+
+        cli.chat()
+
+        assert shown == [True]
+        assert "partial rest\n" in buf.getvalue()
+
+    def test_text_before_error_is_shown(self, cli, monkeypatch):
+        """Test that tokens received before a failure are written."""
+        buf = io.StringIO()
+        monkeypatch.setattr("claif_cla.cli.console", Console(file=buf, width=80))
+
+        def stream():
+            yield from _chunks("partial")
+            raise RuntimeError("boom")
+
+        cli._client.chat.completions.create.return_value = stream()
+        monkeypatch.setattr("sys.stdin", io.StringIO("u1\n"))
+
+        cli.chat()
+
+        out = buf.getvalue()
+        assert "partial" in out
+        assert out.index("partial") < out.index("Error: boom")
+
+
+@pytest.mark.unit
+class TestStreamResponse:
+    """Test the streamed output of `query --stream`."""
+
+    def test_live_panel_shows_text_while_stream_pauses(self, cli, monkeypatch):
+        """Test that the live panel redraws without waiting for the next token."""
+        buf = io.StringIO()
+        monkeypatch.setattr("claif_cla.cli.console", Console(file=buf, width=60, force_terminal=True))
+        shown = []
+
+        def stream():
+            yield from _chunks("Hello ", "**there**")
+            shown.append(_wait_for(buf, "there"))
+            yield from _chunks(" friend")
+
+        cli._client.chat.completions.create.return_value = stream()
+
+        cli._stream_response({"model": "claude-3-5-sonnet-20241022", "messages": []}, json_output=False)
+
+        assert shown == [True]
+        assert "friend" in buf.getvalue()
+
+    def test_json_output_is_ndjson(self, cli, capsys):
+        """Test that `--stream --json_output` prints one JSON object per line."""
+        chunks = _chunks("Hello", " there")
+        cli._client.chat.completions.create.return_value = iter(chunks)
+
+        cli.query("Hi", stream=True, json_output=True)
+
+        lines = capsys.readouterr().out.splitlines()
+        assert len(lines) == len(chunks)
+        assert [json.loads(line)["choices"][0]["delta"]["content"] for line in lines] == ["Hello", " there"]
+        assert [ChatCompletionChunk.model_validate_json(line) for line in lines] == chunks
+
+
+@pytest.mark.unit
+class TestPlainOutput:
+    """Test raw text output when stdout is not a terminal."""
+
+    @pytest.fixture
+    def rich_builders(self, monkeypatch):
+        """Replace the Rich renderables that plain output must not build."""
+        mocks = {name: MagicMock() for name in ("Panel", "Markdown", "Live")}
+        monkeypatch.setattr("rich.panel.Panel", mocks["Panel"])
+        monkeypatch.setattr("rich.markdown.Markdown", mocks["Markdown"])
+        monkeypatch.setattr("rich.live.Live", mocks["Live"])
+        return mocks
+
+    def test_sync_response(self, cli, capsys, rich_builders):
+        """Test that a response is printed verbatim without markdown rendering."""
+        cli._client.chat.completions.create.return_value = ChatCompletion(
+            id="chatcmpl-test",
+            object="chat.completion",
+            created=0,
+            model="claude-3-5-sonnet-20241022",
+            choices=[
+                {
+                    "index": 0,
+                    "finish_reason": "stop",
+                    "message": {"role": "assistant", "content": "# Title\n\n**bold**"},
+                }
+            ],
+        )
+
+        cli.query("Hi")
+
+        assert capsys.readouterr().out == "# Title\n\n**bold**\n"
+        for mock in rich_builders.values():
+            mock.assert_not_called()
+
+    def test_stream_response(self, cli, capsys, rich_builders):
+        """Test that streamed deltas are printed verbatim without markdown rendering."""
+        cli._client.chat.completions.create.return_value = iter(_chunks("# Ti", "tle\n", "**bold**"))
+
+        cli.query("Hi", stream=True)
+
+        assert capsys.readouterr().out == "# Title\n**bold**\n"
+        for mock in rich_builders.values():
+            mock.assert_not_called()
+
+
+@pytest.mark.unit
+class TestMarkdownHint:
+    """Test which replies are rendered as markdown."""
+
+    @pytest.mark.parametrize(
+        "content",
+        [
+            "Title\n=====\nBody",
+            "Intro\n---\nMore",
+            "1) first\n2) second",
+            "1. first\n2. second",
+            "- item\n- item",
+            "Use `code` here",
+            "Some **bold** text",
+            "# Heading",
+            "Example:\n\n    indented code",
+        ],
+    )
+    def test_markdown_is_detected(self, content):
+        """Test that block and inline markdown syntax is recognised."""
+        assert _MARKDOWN_HINT.search(content)
+
+    @pytest.mark.parametrize(
+        "content",
+        [
+            "Hello! How can I help you today?",
+            "First line.\nSecond line - with a dash.\n\nA new paragraph (see 1).",
+        ],
+    )
+    def test_plain_text_is_not_detected(self, content):
+        """Test that prose without markdown syntax skips the markdown parser."""
+        assert not _MARKDOWN_HINT.search(content)
+
+
+@pytest.mark.unit
+class TestInputPrompt:
+    """Test the chat input prompt styling."""
+
+    def test_colour_prompt(self, monkeypatch):
+        """Test that a colour terminal gets a styled prompt."""
+        monkeypatch.setattr("claif_cla.cli.console", Console(force_terminal=True, color_system="standard"))
+        assert "\x1b[" in _input_prompt()
+
+    @pytest.mark.parametrize(
+        "console",
+        [
+            Console(force_terminal=True, color_system="standard", no_color=True),
+            Console(force_terminal=True, color_system=None),
+        ],
+    )
+    def test_plain_prompt_without_colour(self, monkeypatch, console):
+        """Test that NO_COLOR or a colourless console gets a plain prompt."""
+        monkeypatch.setattr("claif_cla.cli.console", console)
+        assert _input_prompt() == "\nYou: "
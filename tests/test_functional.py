@@ -11,7 +11,7 @@ from openai.types.chat.chat_completion_chunk import ChoiceDelta
 from openai.types.chat.chat_completion_message import ChatCompletionMessage
 from openai.types.completion_usage import CompletionUsage
 
-from claif_cla.client import ClaudeClient
+from claif_cla.client import AsyncClaudeClient, ClaudeClient
 
 
 class TestClaudeClientFunctional:
@@ -147,6 +147,101 @@ class TestClaudeClientFunctional:
         # The implementation formats multi-turn conversations
         assert "What's my name?" in prompt
 
+    @patch("claif_cla.client.HAS_CLAUDE_CODE_SDK", True)
+    @patch("claif_cla.client.ClaudeCodeClient")
+    def test_prompt_extraction_order(self, mock_client_class, mock_claude_response):
+        """Test that replies after the last user message are appended in order."""
+        mock_client = MagicMock()
+        mock_client.query.return_value = mock_claude_response
+        mock_client_class.return_value = mock_client
+
+        client = ClaudeClient()
+        client.chat.completions.create(
+            model="claude-3-5-sonnet-20241022",
+            messages=[
+                {"role": "system", "content": "First system"},
+                {"role": "user", "content": "Old question"},
+                {"role": "assistant", "content": "Old answer"},
+                {"role": "user", "content": "Question"},
+                {"role": "assistant", "content": "One"},
+                {"role": "system", "content": "Last system"},
+                {"role": "assistant", "content": "Two"},
+            ],
+        )
+
+        call_args = mock_client.query.call_args
+        assert call_args[0][0] == "Question\n\nAssistant: One\n\nHuman: \n\nAssistant: Two\n\nHuman: "
+        assert call_args.kwargs.get("system") == "Last system"
+
+    @patch("claif_cla.client.HAS_CLAUDE_CODE_SDK", True)
+    @patch("claif_cla.client.ClaudeCodeClient")
+    def test_messages_api_prompt_cache_markers(self, mock_client_class):
+        """Test that the system prompt is sent with cache_control on the messages path."""
+        # Setup mock without a query method so the messages API is used
+        mock_client = MagicMock(spec=["messages"])
+        mock_client.messages.create.return_value = MagicMock(content=[MagicMock(text="Hi")])
+        mock_client_class.return_value = mock_client
+
+        client = ClaudeClient()
+        messages = [
+            {"role": "system", "content": "You are a helpful coding assistant."},
+            {"role": "user", "content": "Hello"},
+        ]
+
+        client.chat.completions.create(model="claude-3-5-sonnet-20241022", messages=messages)
+        call_kwargs = mock_client.messages.create.call_args.kwargs
+        assert call_kwargs["system"] == [
+            {
+                "type": "text",
+                "text": "You are a helpful coding assistant.",
+                "cache_control": {"type": "ephemeral"},
+            }
+        ]
+        # Short prompts stay plain strings
+        assert call_kwargs["messages"] == [{"role": "user", "content": "Hello"}]
+
+        # Each request gets its own blocks, so mutating one cannot leak into the next
+        call_kwargs["system"][0]["text"] = "changed"
+        call_kwargs["system"][0]["cache_control"]["type"] = "changed"
+        client.chat.completions.create(model="claude-3-5-sonnet-20241022", messages=messages)
+        assert mock_client.messages.create.call_args.kwargs["system"] == [
+            {
+                "type": "text",
+                "text": "You are a helpful coding assistant.",
+                "cache_control": {"type": "ephemeral"},
+            }
+        ]
+
+        # Opting out sends the system prompt unchanged
+        client.chat.completions.create(model="claude-3-5-sonnet-20241022", messages=messages, cache_system=False)
+        assert mock_client.messages.create.call_args.kwargs["system"] == "You are a helpful coding assistant."
+
+    @patch("claif_cla.client.HAS_CLAUDE_CODE_SDK", True)
+    @patch("claif_cla.client.ClaudeCodeClient")
+    def test_streaming_uses_sdk_stream(self, mock_client_class):
+        """Test that deltas from the SDK's messages.stream are yielded as they arrive."""
+        mock_client = MagicMock(spec=["messages"])
+        events = [
+            MagicMock(type="message_start"),
+            MagicMock(type="content_block_delta", delta=MagicMock(text="Hello")),
+            MagicMock(type="content_block_delta", delta=MagicMock(text=" there")),
+            MagicMock(type="message_delta", delta=MagicMock(stop_reason="max_tokens")),
+        ]
+        mock_client.messages.stream.return_value.__enter__.return_value = iter(events)
+        mock_client_class.return_value = mock_client
+
+        client = ClaudeClient()
+        chunks = list(
+            client.chat.completions.create(
+                model="claude-3-5-sonnet-20241022", messages=[{"role": "user", "content": "Hi"}], stream=True
+            )
+        )
+
+        mock_client.messages.create.assert_not_called()
+        assert chunks[0].choices[0].delta.role == "assistant"
+        assert [c.choices[0].delta.content for c in chunks[1:-1]] == ["Hello", " there"]
+        assert chunks[-1].choices[0].finish_reason == "length"
+
     @patch("claif_cla.client.HAS_CLAUDE_CODE_SDK", True)
     @patch("claif_cla.client.ClaudeCodeClient")
     def test_error_handling(self, mock_client_class):
@@ -196,6 +291,85 @@ class TestClaudeClientFunctional:
         assert isinstance(response, ChatCompletion)
 
 
+class TestAsyncClaudeClient:
+    """Functional tests for the AsyncClaudeClient."""
+
+    @patch("claif_cla.client.HAS_CLAUDE_CODE_SDK", True)
+    @patch("claif_cla.client.ClaudeCodeClient")
+    async def test_basic_query(self, mock_client_class):
+        """Test awaiting a non-streaming completion."""
+        mock_client = MagicMock()
+        mock_client.query.return_value = "Hello from Claude!"
+        mock_client_class.return_value = mock_client
+
+        client = AsyncClaudeClient(api_key="test-key")
+        response = await client.chat.completions.create(
+            model="claude-3-5-sonnet-20241022", messages=[{"role": "user", "content": "Hello"}], temperature=0.5
+        )
+
+        assert isinstance(response, ChatCompletion)
+        assert response.choices[0].message.content == "Hello from Claude!"
+        assert mock_client.query.call_args.kwargs.get("temperature") == 0.5
+
+    @patch("claif_cla.client.HAS_CLAUDE_CODE_SDK", True)
+    @patch("claif_cla.client.ClaudeCodeClient")
+    async def test_streaming_query(self, mock_client_class):
+        """Test iterating a streamed completion with async for."""
+        mock_client = MagicMock(spec=["messages"])
+        events = [
+            MagicMock(type="content_block_delta", delta=MagicMock(text="Hello")),
+            MagicMock(type="content_block_delta", delta=MagicMock(text=" there")),
+        ]
+        mock_client.messages.stream.return_value.__enter__.return_value = iter(events)
+        mock_client_class.return_value = mock_client
+
+        client = AsyncClaudeClient()
+        stream = await client.chat.completions.create(
+            model="claude-3-5-sonnet-20241022", messages=[{"role": "user", "content": "Hi"}], stream=True
+        )
+        chunks = [chunk async for chunk in stream]
+
+        assert all(isinstance(chunk, ChatCompletionChunk) for chunk in chunks)
+        assert "".join(c.choices[0].delta.content or "" for c in chunks) == "Hello there"
+        assert chunks[-1].choices[0].finish_reason == "stop"
+
+    @patch("claif_cla.client.HAS_CLAUDE_CODE_SDK", True)
+    @patch("claif_cla.client.ClaudeCodeClient")
+    async def test_batch_coalesces_identical_requests(self, mock_client_class):
+        """Test that identical concurrent requests share one upstream call."""
+        import asyncio
+        import threading
+
+        release = threading.Event()
+        mock_client = MagicMock()
+        mock_client.query.side_effect = lambda *a, **k: release.wait(5) and "Shared"
+        mock_client_class.return_value = mock_client
+
+        client = AsyncClaudeClient(batch=True)
+        request = {"model": "claude-3-5-sonnet-20241022", "messages": [{"role": "user", "content": "Hi"}]}
+        tasks = [asyncio.ensure_future(client.chat.completions.create(**request)) for _ in range(3)]
+        other = asyncio.ensure_future(
+            client.chat.completions.create(**{**request, "messages": [{"role": "user", "content": "Bye"}]})
+        )
+        await asyncio.sleep(0.05)
+        release.set()
+        responses = await asyncio.gather(*tasks, other)
+
+        assert [r.choices[0].message.content for r in responses] == ["Shared"] * 4
+        assert responses[0] is not responses[1]
+        assert mock_client.query.call_count == 2
+
+    @patch("claif_cla.client.HAS_CLAUDE_CODE_SDK", False)
+    async def test_no_sdk_error(self):
+        """Test error when SDK is not installed."""
+        client = AsyncClaudeClient()
+
+        with pytest.raises(ImportError):
+            await client.chat.completions.create(
+                model="claude-3-5-sonnet-20241022", messages=[{"role": "user", "content": "Hello"}]
+            )
+
+
 class TestClaudeClientIntegration:
     """Integration tests that would run against real Claude API."""
 
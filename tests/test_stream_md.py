@@ -0,0 +1,129 @@
+# this_file: claif_cla/tests/test_stream_md.py
+"""Tests for incremental streaming markdown rendering."""
+
+import pytest
+from rich.console import Console, Group
+from rich.markdown import Markdown
+
+from claif_cla._stream_md import StreamingMarkdown, _stable_prefix_length
+
+
+def _render(renderable) -> str:
+    console = Console(width=60, record=True, force_terminal=False)
+    console.print(renderable)
+    return console.export_text()
+
+
+def _lines(renderable) -> list[str]:
+    # Vertical spacing between cached blocks may differ slightly from a single
+    # Markdown render, so compare only the non-blank lines.
+    return [line for line in _render(renderable).splitlines() if line.strip()]
+
+
+@pytest.mark.unit
+class TestStablePrefixLength:
+    """Test block boundary detection."""
+
+    def test_no_boundary_without_blank_line(self):
+        """Test that a single growing paragraph is never split."""
+        assert _stable_prefix_length("Hello wor") == 0
+        assert _stable_prefix_length("Hello\nworld\n") == 0
+
+    def test_boundary_after_blank_line(self):
+        """Test that a blank line closes the preceding block."""
+        text = "First para\n\nSecond"
+        assert _stable_prefix_length(text) == len("First para\n\n")
+
+    def test_open_fence_is_not_split(self):
+        """Test that blank lines inside an open code fence are ignored."""
+        text = "```python\nx = 1\n\ny = 2\n"
+        assert _stable_prefix_length(text) == 0
+
+    def test_closed_fence_is_split(self):
+        """Test that a closed fence followed by a blank line is complete."""
+        text = "```python\nx = 1\n\ny = 2\n```\n\nAfter"
+        assert _stable_prefix_length(text) == len(text) - len("After")
+
+    def test_mixed_fences(self):
+        """Test that a fence only closes on a fence of the same character."""
+        text = "Text\n\n~~~\na\n```\n\nb\n~~~\n\nend\n"
+        assert _stable_prefix_length(text) == len(text) - len("end\n")
+
+    def test_shorter_fence_does_not_close(self):
+        """Test that a closing fence must be at least as long as the opener."""
+        text = "````\na\n```\n\nb\n"
+        assert _stable_prefix_length(text) == 0
+
+    def test_indented_continuation_is_not_split(self):
+        """Test that an indented line after a blank line continues the block."""
+        text = "- item\n\n  continued\n\nNext"
+        assert _stable_prefix_length(text) == len(text) - len("Next")
+
+    def test_boundary_waits_for_next_block(self):
+        """Test that a trailing blank line alone does not close the block."""
+        assert _stable_prefix_length("One\n\n") == 0
+
+
+@pytest.mark.unit
+class TestStreamingMarkdown:
+    """Test StreamingMarkdown feed/render behavior."""
+
+    def test_text_round_trips(self):
+        """Test that all fed deltas are preserved in order."""
+        md = StreamingMarkdown()
+        deltas = ["# Ti", "tle\n\nSome ", "*text*\n\n```\ncode\n\n", "more\n```\n", "tail"]
+        for delta in deltas:
+            md.feed(delta)
+
+        assert md.text == "".join(deltas)
+
+    def test_completed_blocks_are_cached(self):
+        """Test that completed blocks are parsed once and kept."""
+        md = StreamingMarkdown()
+        md.feed("One\n\n")
+        md.feed("Two\n\n")
+        md.feed("Thr")
+
+        assert len([r for r in md._completed if isinstance(r, Markdown)]) == 2
+        assert md._tail == "Thr"
+
+    def test_render_matches_full_markdown(self):
+        """Test that incremental rendering matches a single Markdown render."""
+        source = "# Title\n\nA paragraph with **bold**.\n\n- item one\n- item two\n\nClosing line"
+        md = StreamingMarkdown()
+        for i in range(0, len(source), 3):
+            md.feed(source[i : i + 3])
+
+        rendered = md.render()
+        assert isinstance(rendered, Group)
+        assert _lines(rendered) == _lines(Markdown(source))
+
+    @pytest.mark.parametrize(
+        "source",
+        [
+            "Text\n\n~~~\na\n```\n\nb\n~~~\n\nend\n",
+            "- item one\n\n  continued\n\n- item two\n",
+        ],
+    )
+    def test_render_matches_full_markdown_for_nested_blocks(self, source):
+        """Test fences and list continuations that span blank lines."""
+        md = StreamingMarkdown()
+        for char in source:
+            md.feed(char)
+
+        assert _lines(md.render()) == _lines(Markdown(source))
+
+    def test_reference_links_resolve(self):
+        """Test that reference links defined in a later block are resolved."""
+        source = "See [docs][1].\n\nMore text.\n\n[1]: https://example.com\n"
+        md = StreamingMarkdown()
+        for i in range(0, len(source), 4):
+            md.feed(source[i : i + 4])
+
+        rendered = _render(md.render())
+        assert "[docs][1]" not in rendered
+        assert _lines(md.render()) == _lines(Markdown(source))
+
+    def test_render_empty(self):
+        """Test rendering before anything was fed."""
+        assert _render(StreamingMarkdown().render()).strip() == ""